@@ -0,0 +1,261 @@
+import asyncio
+import math
+import os
+import secrets
+import time
+from collections import OrderedDict
+
+from fastapi import HTTPException, Request, status
+
+
+def _env_float(name, default):
+    return float(os.getenv(name, default))
+
+
+def _env_int(name, default):
+    return int(os.getenv(name, default))
+
+
+def _env_list(name):
+    return [item.strip() for item in os.getenv(name, "").split(",") if item.strip()]
+
+
+# --- Configuration (overridable through environment variables) ---
+# A rate of 0 turns per-client rate limiting off
+RATE_LIMIT_PER_SECOND = _env_float("TAX_ADVISOR_RATE_LIMIT_PER_SECOND", 5)
+RATE_LIMIT_BURST = _env_float("TAX_ADVISOR_RATE_LIMIT_BURST", 20)
+# Client IPs of reverse proxies whose X-Forwarded-For header is trusted
+TRUSTED_PROXIES = set(_env_list("TAX_ADVISOR_TRUSTED_PROXIES"))
+# Token required by GET /admission/stats; the endpoint is disabled when unset
+STATS_TOKEN = os.getenv("TAX_ADVISOR_STATS_TOKEN")
+QUEUE_TIMEOUT_SECONDS = _env_float("TAX_ADVISOR_QUEUE_TIMEOUT_SECONDS", 5)
+RETRY_AFTER_SECONDS = _env_int("TAX_ADVISOR_RETRY_AFTER_SECONDS", 1)
+
+# Pool name -> (max concurrent requests, max requests waiting for a slot)
+# Writes default to one at a time because SQLite only allows a single writer.
+POOL_SETTINGS = {
+    "reads": (_env_int("TAX_ADVISOR_READ_CONCURRENCY", 16), _env_int("TAX_ADVISOR_READ_QUEUE", 64)),
+    "writes": (_env_int("TAX_ADVISOR_WRITE_CONCURRENCY", 1), _env_int("TAX_ADVISOR_WRITE_QUEUE", 16)),
+    "calculations": (_env_int("TAX_ADVISOR_CALC_CONCURRENCY", 8), _env_int("TAX_ADVISOR_CALC_QUEUE", 32)),
+}
+
+
+def _validate_settings():
+    """Fails fast on settings that would break admission control at request time."""
+    if RATE_LIMIT_PER_SECOND < 0:
+        raise ValueError("TAX_ADVISOR_RATE_LIMIT_PER_SECOND must be >= 0 (0 disables rate limiting)")
+    if RATE_LIMIT_BURST < 1:
+        raise ValueError("TAX_ADVISOR_RATE_LIMIT_BURST must be >= 1")
+    if QUEUE_TIMEOUT_SECONDS <= 0:
+        raise ValueError("TAX_ADVISOR_QUEUE_TIMEOUT_SECONDS must be > 0")
+    if RETRY_AFTER_SECONDS < 1:
+        raise ValueError("TAX_ADVISOR_RETRY_AFTER_SECONDS must be >= 1")
+    for name, (concurrency, queue) in POOL_SETTINGS.items():
+        if concurrency < 1:
+            raise ValueError(f"Concurrency for the '{name}' pool must be >= 1")
+        if queue < 0:
+            raise ValueError(f"Queue size for the '{name}' pool must be >= 0")
+
+
+_validate_settings()
+
+
+class TokenBucket:
+    """Classic token bucket: refills at `rate` tokens per second up to `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def try_consume(self, now):
+        """Takes one token. Returns 0 on success, otherwise the seconds until a token is available."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+class ClientRateLimiter:
+    """
+    Keeps one token bucket per client key, ordered by last use so idle buckets can be
+    dropped from the front. Only touched from the event loop, so no locking.
+    A rate of 0 disables limiting.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        # After this long a bucket has refilled completely, so dropping it loses nothing
+        self.idle_seconds = burst / rate if rate else 0
+        self._buckets = OrderedDict()
+        self.rejected = 0
+
+    def check(self, client_key):
+        """Returns 0 if the request is allowed, otherwise the seconds the client should wait."""
+        if not self.rate:
+            return 0
+        now = time.monotonic()
+        self._evict_idle(now)
+        bucket = self._buckets.get(client_key)
+        if bucket is None:
+            bucket = self._buckets[client_key] = TokenBucket(self.rate, self.burst)
+        else:
+            self._buckets.move_to_end(client_key)
+        wait = bucket.try_consume(now)
+        if wait:
+            self.rejected += 1
+        return wait
+
+    def _evict_idle(self, now):
+        """Drops buckets that have been idle long enough to be full again, oldest first."""
+        while self._buckets:
+            oldest = next(iter(self._buckets.values()))
+            if now - oldest.updated_at <= self.idle_seconds:
+                break
+            self._buckets.popitem(last=False)
+
+    def stats(self):
+        return {"enabled": bool(self.rate), "tracked_clients": len(self._buckets), "rejected": self.rejected}
+
+
+class ConcurrencyPool:
+    """
+    Limits how many requests of one kind run at once, with a bounded waiting queue.
+    Requests that find the queue full, or wait longer than `timeout`, are rejected.
+    Waiting happens on the event loop so queued requests don't hold threadpool workers.
+    """
+
+    def __init__(self, name, max_concurrency, max_queue, timeout):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._cond = asyncio.Condition()
+        self.active = 0
+        self.waiting = 0
+        self.completed = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+
+    async def acquire(self):
+        """Claims a slot. Returns True on success, False if the request should be rejected."""
+        if self.active < self.max_concurrency and self.waiting == 0:
+            self.active += 1
+            return True
+        if self.waiting >= self.max_queue:
+            self.rejected_queue_full += 1
+            return False
+
+        self.waiting += 1
+        acquired = False
+        try:
+            async with self._cond:
+                await asyncio.wait_for(
+                    self._cond.wait_for(lambda: self.active < self.max_concurrency),
+                    self.timeout
+                )
+                self.active += 1
+                acquired = True
+            return True
+        except asyncio.TimeoutError:
+            self.rejected_timeout += 1
+            return False
+        finally:
+            self.waiting -= 1
+            if not acquired and self.active < self.max_concurrency:
+                # We may have been notified just before timing out or being cancelled;
+                # pass the wake-up on so the free slot isn't stranded
+                async with self._cond:
+                    self._cond.notify()
+
+    async def release(self):
+        self.active -= 1
+        self.completed += 1
+        async with self._cond:
+            self._cond.notify()
+
+    def stats(self):
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "queue_depth": self.waiting,
+            "completed": self.completed,
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_timeout": self.rejected_timeout,
+        }
+
+
+# Shared instances used by the API
+rate_limiter = ClientRateLimiter(RATE_LIMIT_PER_SECOND, RATE_LIMIT_BURST)
+pools = {
+    name: ConcurrencyPool(name, concurrency, queue, QUEUE_TIMEOUT_SECONDS)
+    for name, (concurrency, queue) in POOL_SETTINGS.items()
+}
+
+
+def _client_key(request: Request):
+    """
+    Identifies the client for rate limiting. When the direct peer is a trusted proxy, the
+    right-most X-Forwarded-For address that isn't itself a trusted proxy is used instead.
+    """
+    host = request.client.host if request.client else "unknown"
+    if host not in TRUSTED_PROXIES:
+        return host
+    forwarded = [addr.strip() for addr in request.headers.get("x-forwarded-for", "").split(",") if addr.strip()]
+    for addr in reversed(forwarded):
+        if addr not in TRUSTED_PROXIES:
+            return addr
+    return host
+
+
+def admit(pool_name):
+    """
+    Builds a FastAPI dependency that applies the per-client rate limit and then
+    holds a slot in the named pool for the duration of the request.
+    """
+    async def dependency(request: Request):
+        pool = pools[pool_name]
+        wait = rate_limiter.check(_client_key(request))
+        if wait:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Rate limit exceeded. Please slow down.",
+                headers={"Retry-After": str(max(1, math.ceil(wait)))}
+            )
+
+        if not await pool.acquire():
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy. Please retry shortly.",
+                headers={"Retry-After": str(RETRY_AFTER_SECONDS)}
+            )
+        try:
+            yield
+        finally:
+            await pool.release()
+
+    return dependency
+
+
+def require_stats_token(request: Request):
+    """
+    FastAPI dependency guarding the stats endpoint. It is hidden (404) unless
+    TAX_ADVISOR_STATS_TOKEN is set, and then requires a matching X-Stats-Token header.
+    """
+    if not STATS_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not secrets.compare_digest(request.headers.get("x-stats-token", ""), STATS_TOKEN):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid stats token.")
+
+
+def get_admission_stats():
+    """Returns queue depth and rejection counters for the rate limiter and every pool."""
+    return {
+        "rate_limiter": rate_limiter.stats(),
+        "pools": {name: pool.stats() for name, pool in pools.items()},
+    }
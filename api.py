@@ -2,7 +2,7 @@ from fastapi import FastAPI, Depends, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
 
-import crud, models, schemas, predict
+import admission, crud, models, schemas, predict
 from database import SessionLocal, engine
 
 # Create all database tables based on the models
@@ -30,7 +30,12 @@ def get_db():
 
 # --- API Endpoints ---
 
-@app.post("/profile", response_model=schemas.User, status_code=status.HTTP_201_CREATED)
+@app.post(
+    "/profile",
+    response_model=schemas.User,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(admission.admit("writes"))]
+)
 def create_or_update_profile(user_data: schemas.UserCreate, db: Session = Depends(get_db)):
     """
     Create or update a user profile with financial data.
@@ -43,7 +48,11 @@ def create_or_update_profile(user_data: schemas.UserCreate, db: Session = Depend
             detail=f"An error occurred while saving the profile: {e}"
         )
 
-@app.get("/profile/{email}", response_model=schemas.FinancialProfileBase)
+@app.get(
+    "/profile/{email}",
+    response_model=schemas.FinancialProfileBase,
+    dependencies=[Depends(admission.admit("reads"))]
+)
 def get_profile(email: str, db: Session = Depends(get_db)):
     """
     Retrieve an existing user's financial profile by email.
@@ -95,7 +104,7 @@ def get_profile(email: str, db: Session = Depends(get_db)):
         )
     )
 
-@app.post("/calculate/{email}")
+@app.post("/calculate/{email}", dependencies=[Depends(admission.admit("calculations"))])
 def calculate_for_user(email: str, db: Session = Depends(get_db)):
     """
     Run the tax calculation for a user with a saved profile.
@@ -134,6 +143,13 @@ def calculate_for_user(email: str, db: Session = Depends(get_db)):
             detail=f"An error occurred during tax calculation: {e}"
         )
 
+@app.get("/admission/stats", dependencies=[Depends(admission.require_stats_token)])
+def get_admission_stats():
+    """
+    Report queue depth, active requests and rejection counts for each worker pool.
+    """
+    return admission.get_admission_stats()
+
 @app.get("/")
 def read_root():
     return {"status": "AI Tax Advisor API is running"}
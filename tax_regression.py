@@ -0,0 +1,463 @@
+import argparse
+import gzip
+import hashlib
+import importlib
+import json
+import math
+import numbers
+import random
+import subprocess
+import sys
+import zlib
+from contextlib import contextmanager
+from itertools import islice
+from pathlib import Path
+
+from tax_calculator import calculate_final_tax, calculate_tax_on_income
+from tax_rules import tax_rules_engine
+
+AGE_GROUPS = ['below_60', 'between_60_80', 'above_80']
+RESIDENT_STATUSES = ['resident', 'non_resident']
+DISABILITY_OPTIONS = ['none', 'disability', 'severe_disability']
+REGIMES = ['old', 'new']
+RESULT_KEYS = ['taxable_income', 'total_tax', 'gti', 'income_tax', 'cess']
+
+DEFAULT_CORPUS_SIZE = 200000
+DEFAULT_SEED = 2024
+
+# Rebate thresholds used by calculate_final_tax for Section 87A
+REBATE_LIMITS = {'old': 500000, 'new': 700000}
+
+# Share of generated cases whose taxable income must land within ±1 of a slab edge or rebate limit
+BOUNDARY_CASE_RATE = 0.4
+MIN_BOUNDARY_COVERAGE = 0.25
+MIN_CASES_FOR_COVERAGE_CHECK = 1000
+
+BASE_DIR = Path(__file__).parent
+DEFAULT_CORPUS_PATH = BASE_DIR / "golden_corpus.jsonl.gz"
+DEFAULT_BATCH_SIZE = 1000
+
+
+def _file_sha256(name):
+    return hashlib.sha256((BASE_DIR / name).read_bytes()).hexdigest()
+
+
+def _git_revision():
+    """Returns the current git commit of the repository, or None if it isn't available."""
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=BASE_DIR, capture_output=True, text=True, check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+def slabs_for(regime, profile):
+    """Returns the slab list calculate_tax_on_income applies for this regime and profile."""
+    slabs_by_age = tax_rules_engine.get_slabs(regime)
+    if regime == 'new':
+        return slabs_by_age
+    if profile['resident_status'] == 'resident':
+        return slabs_by_age.get(profile['age_group'], slabs_by_age['below_60'])
+    return slabs_by_age['below_60']
+
+
+def slab_edges(regime, profile):
+    """Returns the income levels where the slab rate changes."""
+    return sorted({slab.get('upto', slab.get('above')) for slab in slabs_for(regime, profile)})
+
+
+def taxable_income_boundaries(regime, profile):
+    """Returns the taxable income levels where calculate_final_tax changes behaviour."""
+    return sorted(set(slab_edges(regime, profile)) | {REBATE_LIMITS[regime]})
+
+
+def is_boundary_hit(case, taxable_income):
+    """True if `taxable_income` is within ±1 of a slab edge or rebate limit for the case."""
+    return any(
+        abs(taxable_income - point) <= 1
+        for point in taxable_income_boundaries(case["regime"], case["profile"])
+    )
+
+
+def _amount(rng, high):
+    """Picks an amount: zero, a random integer or a random value with paise up to `high`."""
+    choice = rng.random()
+    if choice < 0.25:
+        return 0
+    if choice < 0.40:
+        return round(rng.uniform(0, high), 2)
+    return rng.randint(0, high)
+
+
+def random_case(rng):
+    """Generates one (profile, income, deductions, regime) case for the calculator."""
+    salary_total = _amount(rng, 5000000)
+    salary_basic = rng.randint(0, int(salary_total)) if salary_total else 0
+    salary_hra = rng.randint(0, int(salary_total - salary_basic)) if salary_total > salary_basic else 0
+
+    profile = {
+        "age_group": rng.choice(AGE_GROUPS),
+        "resident_status": rng.choice(RESIDENT_STATUSES),
+    }
+    income = {
+        "salary": {
+            "salary_total": salary_total,
+            "salary_basic": salary_basic,
+            "salary_hra": salary_hra,
+        },
+        "house_property": {
+            "hp_rent_received": _amount(rng, 1000000),
+            "hp_municipal_taxes": _amount(rng, 50000),
+        },
+        "capital_gains": _amount(rng, 2000000),
+        "business_profession": _amount(rng, 3000000),
+        "other_sources": _amount(rng, 500000),
+        "other_sources_interest_savings": _amount(rng, 30000),
+    }
+    deductions = {
+        "hra_details": {
+            "rent_paid": _amount(rng, 600000),
+            "is_metro": rng.random() < 0.5,
+        },
+        "section_80c": _amount(rng, 250000),
+        "section_80ccd_1b": _amount(rng, 100000),
+        "section_80d_self": _amount(rng, 75000),
+        "self_above_60": rng.random() < 0.5,
+        "section_80d_parents": _amount(rng, 75000),
+        "parents_above_60": rng.random() < 0.5,
+        "section_24b": _amount(rng, 300000),
+        "section_80e": _amount(rng, 200000),
+        "section_80g": _amount(rng, 200000),
+        "section_80u": rng.choice(DISABILITY_OPTIONS),
+        "section_80dd": rng.choice(DISABILITY_OPTIONS),
+    }
+    case = {
+        "profile": profile,
+        "income": income,
+        "deductions": deductions,
+        "regime": rng.choice(REGIMES),
+    }
+    if rng.random() < BOUNDARY_CASE_RATE:
+        _pin_to_boundary(rng, case)
+    return case
+
+
+def _pin_to_boundary(rng, case):
+    """
+    Rewrites `case` so its taxable income equals a slab edge or rebate limit plus -1, 0 or +1.
+    Income heads and deductions that don't move one-for-one with salary are zeroed, the
+    rest are kept as whole rupees, and salary is then solved for the target.
+    """
+    income, deductions = case["income"], case["deductions"]
+    income["house_property"] = {"hp_rent_received": 0, "hp_municipal_taxes": 0}
+    for key in ['capital_gains', 'business_profession', 'other_sources', 'other_sources_interest_savings']:
+        income[key] = 0
+    deductions["hra_details"]["rent_paid"] = 0
+    deductions["section_24b"] = 0
+    deductions["section_80g"] = 0
+    for key in ['section_80c', 'section_80ccd_1b', 'section_80d_self', 'section_80d_parents', 'section_80e']:
+        deductions[key] = int(deductions[key])
+
+    target = rng.choice(taxable_income_boundaries(case["regime"], case["profile"])) + rng.choice([-1, 0, 1])
+    salary = target + tax_rules_engine.get_deduction_limit('standard_deduction')
+    # Taxable income moves one-for-one with salary here, so this converges in one correction
+    for _ in range(3):
+        income["salary"] = {"salary_total": salary, "salary_basic": salary // 2, "salary_hra": 0}
+        taxable_income = calculate_final_tax(case["profile"], income, deductions, case["regime"])['taxable_income']
+        if taxable_income == target:
+            break
+        salary += target - taxable_income
+
+
+def iter_cases(count, seed=DEFAULT_SEED):
+    """Yields `count` deterministic cases for the given seed."""
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield random_case(rng)
+
+
+def iter_slab_cases():
+    """
+    Yields (taxable_income, regime, profile) cases for calculate_tax_on_income covering every
+    slab edge ±1 for each regime, age group and residency.
+    """
+    for regime in REGIMES:
+        for age_group in AGE_GROUPS:
+            for resident_status in RESIDENT_STATUSES:
+                profile = {"age_group": age_group, "resident_status": resident_status}
+                edges = slab_edges(regime, profile)
+                for point in [0] + edges + [edges[-1] * 10]:
+                    for offset in [-1, 0, 1]:
+                        if point + offset >= 0:
+                            yield {"taxable_income": point + offset, "regime": regime, "profile": profile}
+
+
+def run_engine(engine, case):
+    """Runs a calculator with the calculate_final_tax signature on a single case."""
+    return engine(case["profile"], case["income"], case["deductions"], case["regime"])
+
+
+def run_slab_engine(engine, case):
+    """Runs a calculator with the calculate_tax_on_income signature on a single case."""
+    return engine(case["taxable_income"], case["regime"], case["profile"])
+
+
+class EngineError:
+    """Stands in for the result of an engine call that raised or returned something unusable."""
+
+    def __init__(self, message):
+        self.message = message
+
+
+def _call(runner, engine, case):
+    try:
+        return runner(engine, case)
+    except Exception as e:
+        return EngineError(f"{type(e).__name__}: {e}")
+
+
+def _run_chunk(engine, cases, batch):
+    """
+    Returns one result per case. A batch engine takes the whole list of cases and must
+    return a sequence of results in the same order; a scalar engine is called per case.
+    """
+    if not batch:
+        return [_call(run_engine, engine, case) for case in cases]
+    results = _call(lambda e, c: list(e(c)), engine, cases)
+    if not isinstance(results, EngineError) and len(results) != len(cases):
+        results = EngineError(f"batch of {len(cases)} cases returned {len(results)} results")
+    if isinstance(results, EngineError):
+        return [results] * len(cases)
+    return results
+
+
+def _is_number(value):
+    return isinstance(value, numbers.Real) and not isinstance(value, bool)
+
+
+def _values_match(expected, actual, exact=False, rel_tol=1e-9, abs_tol=1e-6):
+    if not _is_number(actual):
+        return False
+    if exact:
+        return expected == actual
+    return math.isclose(expected, actual, rel_tol=rel_tol, abs_tol=abs_tol)
+
+
+def compare_results(expected, actual):
+    """Returns a list of (key, expected, actual) tuples for every field that differs."""
+    if isinstance(actual, EngineError):
+        return [("exception", None, actual.message)]
+    if not isinstance(actual, dict):
+        return [("result", expected, actual)]
+    return [
+        (key, expected[key], actual.get(key))
+        for key in RESULT_KEYS
+        if not _values_match(expected[key], actual.get(key), exact=(key == 'total_tax'))
+    ]
+
+
+def compare_tax(expected, actual):
+    """Returns a one-item mismatch list if a calculate_tax_on_income result differs."""
+    if isinstance(actual, EngineError):
+        return [("exception", None, actual.message)]
+    return [] if _values_match(expected, actual) else [("tax", expected, actual)]
+
+
+def _diff_cases(engine, cases_with_expected, batch_size=None):
+    """
+    Compares `engine` against the expected result of each (case, expected) pair.
+    Returns (checked_count, boundary_hits, first_failure) where first_failure is None or
+    (index, case, mismatches). `batch_size` switches to calling a batch engine per chunk.
+    """
+    checked = 0
+    boundary_hits = 0
+    pairs = iter(cases_with_expected)
+    while True:
+        chunk = list(islice(pairs, batch_size or 1))
+        if not chunk:
+            return checked, boundary_hits, None
+        cases = [case for case, _ in chunk]
+        for case, (_, expected), actual in zip(cases, chunk, _run_chunk(engine, cases, batch_size)):
+            boundary_hits += is_boundary_hit(case, expected["taxable_income"])
+            mismatches = compare_results(expected, actual)
+            checked += 1
+            if mismatches:
+                return checked, boundary_hits, (checked - 1, case, mismatches)
+
+
+def load_engine(spec):
+    """Imports an engine given as 'module:function'."""
+    module_name, _, func_name = spec.partition(':')
+    if not func_name:
+        raise ValueError(f"Engine '{spec}' must be given as 'module:function'")
+    return getattr(importlib.import_module(module_name), func_name)
+
+
+def corpus_header(count, seed):
+    """Describes where a corpus came from, so stale or truncated files can be rejected."""
+    return {
+        "seed": seed,
+        "count": count,
+        "financial_year": tax_rules_engine.financial_year,
+        "rules_sha256": _file_sha256("tax_rules.yaml"),
+        "calculator_sha256": _file_sha256("tax_calculator.py"),
+        "revision": _git_revision(),
+    }
+
+
+def generate_corpus(path=DEFAULT_CORPUS_PATH, count=DEFAULT_CORPUS_SIZE, seed=DEFAULT_SEED):
+    """
+    Writes a gzipped JSONL corpus of cases with reference outputs from calculate_final_tax.
+    Returns (count, boundary_hits).
+    """
+    boundary_hits = 0
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        f.write(json.dumps(corpus_header(count, seed)) + "\n")
+        for case in iter_cases(count, seed):
+            case["expected"] = run_engine(calculate_final_tax, case)
+            boundary_hits += is_boundary_hit(case, case["expected"]["taxable_income"])
+            f.write(json.dumps(case, separators=(',', ':')) + "\n")
+    return count, boundary_hits
+
+
+@contextmanager
+def open_corpus(path=DEFAULT_CORPUS_PATH):
+    """Opens a corpus file and yields (header, iterator of cases), each case carrying its 'expected' result."""
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        header = json.loads(f.readline() or "null")
+        if not isinstance(header, dict) or "rules_sha256" not in header:
+            raise ValueError(f"{path} has no corpus header; regenerate it with 'generate'")
+        yield header, (json.loads(line) for line in f)
+
+
+def check_corpus(engine, path=DEFAULT_CORPUS_PATH, batch_size=None):
+    """
+    Replays the stored corpus through `engine`.
+    Returns (checked_count, boundary_hits, first_failure) in the same shape as _diff_cases.
+    Raises ValueError if the corpus is stale, truncated or corrupt.
+    """
+    try:
+        with open_corpus(path) as (header, cases):
+            rules_sha256 = _file_sha256("tax_rules.yaml")
+            if header["rules_sha256"] != rules_sha256:
+                raise ValueError(
+                    f"{path} was generated from different tax rules "
+                    f"(corpus {header['rules_sha256'][:12]}, current {rules_sha256[:12]}); regenerate it"
+                )
+            pairs = ((case, case.pop("expected")) for case in cases)
+            checked, boundary_hits, failure = _diff_cases(engine, pairs, batch_size)
+            if failure is None:
+                # Read anything left so a corpus with more cases than its header says is caught too
+                checked += sum(1 for _ in cases)
+    except (EOFError, zlib.error, gzip.BadGzipFile, json.JSONDecodeError) as e:
+        raise ValueError(f"{path} is truncated or corrupt: {e}")
+
+    if failure is None and checked != header["count"]:
+        raise ValueError(f"{path} holds {checked} cases but its header says {header['count']}")
+    return checked, boundary_hits, failure
+
+
+def fuzz(engine, count, seed, reference=calculate_final_tax, batch_size=None):
+    """
+    Runs freshly generated cases through both `reference` and `engine`.
+    Returns (checked_count, boundary_hits, first_failure) in the same shape as _diff_cases.
+    """
+    pairs = ((case, run_engine(reference, case)) for case in iter_cases(count, seed))
+    return _diff_cases(engine, pairs, batch_size)
+
+
+def check_slabs(engine, reference=calculate_tax_on_income):
+    """
+    Sweeps every slab edge ±1 (plus zero and a very high income) through both `reference`
+    and a calculate_tax_on_income replacement.
+    Returns (checked_count, first_failure) where first_failure is None or (index, case, mismatches).
+    """
+    checked = 0
+    for index, case in enumerate(iter_slab_cases()):
+        expected = run_slab_engine(reference, case)
+        mismatches = compare_tax(expected, _call(run_slab_engine, engine, case))
+        checked += 1
+        if mismatches:
+            return checked, (index, case, mismatches)
+    return checked, None
+
+
+def _report_failure(checked, failure):
+    """Prints the first mismatching case and returns the process exit code."""
+    index, case, mismatches = failure
+    print(f"MISMATCH at case #{index} after {checked} cases")
+    print(json.dumps(case, indent=2))
+    for key, expected, actual in mismatches:
+        print(f"  {key}: expected {expected!r}, got {actual!r}")
+    return 1
+
+
+def _report(checked, boundary_hits, failure):
+    """Prints the outcome of a corpus check or fuzz run and returns the process exit code."""
+    if failure is not None:
+        return _report_failure(checked, failure)
+
+    print(f"OK: {checked} cases matched the reference "
+          f"({boundary_hits} within ±1 of a slab edge or rebate limit)")
+    if checked >= MIN_CASES_FOR_COVERAGE_CHECK and boundary_hits < MIN_BOUNDARY_COVERAGE * checked:
+        print(f"FAIL: boundary coverage {boundary_hits / checked:.1%} is below {MIN_BOUNDARY_COVERAGE:.0%}")
+        return 1
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Golden-result corpus and differential fuzzing for the tax calculator.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    gen = subparsers.add_parser("generate", help="Generate the golden corpus from the reference calculator")
+    gen.add_argument("--path", default=DEFAULT_CORPUS_PATH)
+    gen.add_argument("--count", type=int, default=DEFAULT_CORPUS_SIZE)
+    gen.add_argument("--seed", type=int, default=DEFAULT_SEED)
+
+    batch_help = "Engine takes a list of cases and returns a list of results; cases are sent in chunks of N"
+
+    check = subparsers.add_parser("check", help="Replay the golden corpus through an engine")
+    check.add_argument("--engine", default="tax_calculator:calculate_final_tax")
+    check.add_argument("--path", default=DEFAULT_CORPUS_PATH)
+    check.add_argument("--batch", type=int, nargs="?", const=DEFAULT_BATCH_SIZE, metavar="N", help=batch_help)
+
+    fz = subparsers.add_parser("fuzz", help="Differentially test an engine against the reference on random cases")
+    fz.add_argument("--engine", required=True)
+    fz.add_argument("--count", type=int, default=100000)
+    fz.add_argument("--seed", type=int, default=None)
+    fz.add_argument("--batch", type=int, nargs="?", const=DEFAULT_BATCH_SIZE, metavar="N", help=batch_help)
+
+    slabs = subparsers.add_parser("slabs", help="Sweep slab edges through a calculate_tax_on_income replacement")
+    slabs.add_argument("--engine", required=True)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "generate":
+        count, boundary_hits = generate_corpus(args.path, args.count, args.seed)
+        print(f"Wrote {count} cases to {args.path} ({boundary_hits} within ±1 of a slab edge or rebate limit)")
+        return 0
+
+    engine = load_engine(args.engine)
+    if args.command == "check":
+        try:
+            return _report(*check_corpus(engine, args.path, args.batch))
+        except (ValueError, FileNotFoundError) as e:
+            print(f"ERROR: {e}")
+            return 1
+
+    if args.command == "slabs":
+        checked, failure = check_slabs(engine)
+        if failure is not None:
+            return _report_failure(checked, failure)
+        print(f"OK: {checked} slab sweep cases matched the reference")
+        return 0
+
+    seed = args.seed if args.seed is not None else random.randrange(2 ** 32)
+    print(f"Fuzzing with seed {seed}")
+    return _report(*fuzz(engine, args.count, seed, batch_size=args.batch))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
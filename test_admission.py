@@ -0,0 +1,151 @@
+import asyncio
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+import admission
+
+
+@pytest.fixture
+def limiter(monkeypatch):
+    rate_limiter = admission.ClientRateLimiter(rate=1, burst=2)
+    monkeypatch.setattr(admission, "rate_limiter", rate_limiter)
+    return rate_limiter
+
+
+@pytest.fixture
+def pools(monkeypatch):
+    test_pools = {
+        "reads": admission.ConcurrencyPool("reads", 2, 2, timeout=0.1),
+        "writes": admission.ConcurrencyPool("writes", 1, 0, timeout=0.1),
+    }
+    monkeypatch.setattr(admission, "pools", test_pools)
+    return test_pools
+
+
+@pytest.fixture
+def client(limiter, pools):
+    app = FastAPI()
+
+    @app.get("/read", dependencies=[Depends(admission.admit("reads"))])
+    def read():
+        return {"ok": True}
+
+    @app.post("/write", dependencies=[Depends(admission.admit("writes"))])
+    def write():
+        return {"ok": True}
+
+    return TestClient(app)
+
+
+def test_rate_limit_returns_429_with_retry_after(client):
+    assert client.get("/read").status_code == 200
+    assert client.get("/read").status_code == 200
+
+    response = client.get("/read")
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+
+
+def test_full_queue_returns_503_with_retry_after(client, pools):
+    pools["writes"].active = pools["writes"].max_concurrency
+
+    response = client.post("/write")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(admission.RETRY_AFTER_SECONDS)
+    assert pools["writes"].rejected_queue_full == 1
+
+
+def test_queue_timeout_returns_503(client, pools):
+    pools["reads"].active = pools["reads"].max_concurrency
+
+    response = client.get("/read")
+    assert response.status_code == 503
+    assert pools["reads"].rejected_timeout == 1
+    assert pools["reads"].waiting == 0
+
+
+def test_reads_served_while_writes_saturated(client, pools):
+    pools["writes"].active = pools["writes"].max_concurrency
+
+    assert client.post("/write").status_code == 503
+    assert client.get("/read").status_code == 200
+
+
+def test_idle_buckets_are_evicted(limiter, monkeypatch):
+    now = 1000.0
+    monkeypatch.setattr(admission.time, "monotonic", lambda: now)
+    limiter.check("a")
+    limiter.check("b")
+    assert limiter.stats()["tracked_clients"] == 2
+
+    now += limiter.idle_seconds + 1
+    limiter.check("c")
+    assert limiter.stats()["tracked_clients"] == 1
+
+
+def test_zero_rate_disables_limiting():
+    limiter = admission.ClientRateLimiter(rate=0, burst=1)
+    assert all(limiter.check("a") == 0 for _ in range(100))
+
+
+class _FakeRequest:
+    def __init__(self, host, forwarded_for=None):
+        self.client = type("Client", (), {"host": host})
+        self.headers = {"x-forwarded-for": forwarded_for} if forwarded_for else {}
+
+
+def test_forwarded_for_only_trusted_from_configured_proxies(monkeypatch):
+    monkeypatch.setattr(admission, "TRUSTED_PROXIES", {"10.0.0.1"})
+
+    assert admission._client_key(_FakeRequest("203.0.113.9", "198.51.100.7")) == "203.0.113.9"
+    assert admission._client_key(_FakeRequest("10.0.0.1", "198.51.100.7, 203.0.113.5, 10.0.0.1")) == "203.0.113.5"
+    assert admission._client_key(_FakeRequest("10.0.0.1")) == "10.0.0.1"
+
+
+def test_cancelled_waiter_passes_slot_on():
+    async def scenario():
+        pool = admission.ConcurrencyPool("test", 1, 2, timeout=1)
+        assert await pool.acquire()
+        first = asyncio.create_task(pool.acquire())
+        second = asyncio.create_task(pool.acquire())
+        await asyncio.sleep(0)
+
+        # Release by hand while holding the lock, so the notified first waiter is
+        # cancelled before it can retake the lock and claim the slot
+        async with pool._cond:
+            pool.active -= 1
+            pool._cond.notify()
+            first.cancel()
+            await asyncio.sleep(0)
+
+        acquired = await asyncio.wait_for(second, 0.5)
+        return first.cancelled(), acquired, pool
+
+    first_cancelled, acquired, pool = asyncio.run(scenario())
+    assert first_cancelled
+    assert acquired
+    assert pool.active == 1
+    assert pool.waiting == 0
+
+
+def test_stats_endpoint_bypasses_pools_and_requires_token(monkeypatch, limiter, pools):
+    import api
+
+    monkeypatch.setattr(admission, "STATS_TOKEN", "secret")
+    pools["reads"].active = pools["reads"].max_concurrency
+    client = TestClient(api.app)
+
+    assert client.get("/admission/stats").status_code == 401
+    for _ in range(5):
+        response = client.get("/admission/stats", headers={"X-Stats-Token": "secret"})
+        assert response.status_code == 200
+    assert response.json()["pools"]["reads"]["active"] == pools["reads"].max_concurrency
+
+
+def test_stats_endpoint_hidden_without_token(monkeypatch):
+    import api
+
+    monkeypatch.setattr(admission, "STATS_TOKEN", None)
+    assert TestClient(api.app).get("/admission/stats").status_code == 404
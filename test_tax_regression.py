@@ -0,0 +1,116 @@
+import gzip
+from fractions import Fraction
+
+import pytest
+
+import tax_regression
+from tax_calculator import calculate_final_tax, calculate_tax_on_income
+
+SEED = 7
+
+
+def test_fuzz_reference_matches_itself():
+    checked, boundary_hits, failure = tax_regression.fuzz(calculate_final_tax, 2000, SEED)
+    assert failure is None
+    assert checked == 2000
+    assert boundary_hits >= tax_regression.MIN_BOUNDARY_COVERAGE * checked
+
+
+def test_slab_sweep_reference_matches_itself():
+    checked, failure = tax_regression.check_slabs(calculate_tax_on_income)
+    assert failure is None
+    assert checked > 0
+
+
+def test_fuzz_reports_off_by_one_at_boundary():
+    def engine(profile, income, deductions, regime):
+        result = calculate_final_tax(profile, income, deductions, regime)
+        if result['taxable_income'] == 500001:
+            result['total_tax'] += 1
+        return result
+
+    _, _, failure = tax_regression.fuzz(engine, 2000, SEED)
+    assert failure is not None
+    index, case, mismatches = failure
+    assert mismatches[0][0] == 'total_tax'
+
+
+def test_fuzz_reports_engine_exception_with_case():
+    def engine(profile, income, deductions, regime):
+        raise RuntimeError("boom")
+
+    _, _, failure = tax_regression.fuzz(engine, 10, SEED)
+    index, case, mismatches = failure
+    assert index == 0
+    assert "regime" in case
+    assert mismatches == [("exception", None, "RuntimeError: boom")]
+
+
+def test_slab_sweep_reports_bug_at_edge():
+    def engine(taxable_income, regime, profile):
+        tax = calculate_tax_on_income(taxable_income, regime, profile)
+        return tax + 1 if taxable_income == 1200001 else tax
+
+    _, failure = tax_regression.check_slabs(engine)
+    assert failure is not None
+    assert failure[1]["taxable_income"] == 1200001
+
+
+def test_batch_engine():
+    def engine(cases):
+        return [tax_regression.run_engine(calculate_final_tax, case) for case in cases]
+
+    checked, _, failure = tax_regression.fuzz(engine, 500, SEED, batch_size=64)
+    assert failure is None
+    assert checked == 500
+
+
+def test_batch_engine_with_wrong_result_count():
+    def engine(cases):
+        return []
+
+    _, _, failure = tax_regression.fuzz(engine, 10, SEED, batch_size=4)
+    assert failure[2][0][0] == "exception"
+
+
+def test_non_builtin_real_numbers_are_accepted():
+    # numpy scalars and similar types register as numbers.Real without subclassing int/float
+    def engine(profile, income, deductions, regime):
+        result = calculate_final_tax(profile, income, deductions, regime)
+        result['total_tax'] = Fraction(result['total_tax'])
+        return result
+
+    assert tax_regression.fuzz(engine, 200, SEED)[2] is None
+
+
+def test_corpus_round_trip(tmp_path):
+    path = tmp_path / "corpus.jsonl.gz"
+    tax_regression.generate_corpus(path, 300, SEED)
+    checked, _, failure = tax_regression.check_corpus(calculate_final_tax, path)
+    assert failure is None
+    assert checked == 300
+
+
+def test_corpus_with_wrong_case_count_is_rejected(tmp_path):
+    path = tmp_path / "corpus.jsonl.gz"
+    tax_regression.generate_corpus(path, 300, SEED)
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        lines = f.readlines()
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        f.writelines(lines[:-10])
+
+    with pytest.raises(ValueError, match="holds 290 cases but its header says 300"):
+        tax_regression.check_corpus(calculate_final_tax, path)
+
+
+def test_corpus_from_other_rules_is_rejected(tmp_path):
+    path = tmp_path / "corpus.jsonl.gz"
+    tax_regression.generate_corpus(path, 10, SEED)
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        lines = f.readlines()
+    lines[0] = lines[0].replace('"rules_sha256": "', '"rules_sha256": "0')
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        f.writelines(lines)
+
+    with pytest.raises(ValueError, match="different tax rules"):
+        tax_regression.check_corpus(calculate_final_tax, path)